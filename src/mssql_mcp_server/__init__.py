@@ -1,9 +1,25 @@
-from . import server
 import asyncio
+import importlib
+import logging
+
+# Configure logging once for whichever server is started; a host application
+# that already set up logging keeps its own handlers.
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
 
 def main():
    """Main entry point for the package."""
+   server = importlib.import_module(f"{__name__}.server")
    asyncio.run(server.main())
 
+def __getattr__(name):
+    # Import the server lazily so importing the package stays cheap.
+    if name == "server":
+        return importlib.import_module(f"{__name__}.server")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # Expose important items at package level
-__all__ = ['main', 'server']
\ No newline at end of file
+__all__ = ['main', 'server']
@@ -0,0 +1,530 @@
+"""Shared configuration, connection pool and tools for the MSSQL MCP servers.
+
+Each server module builds its FastMCP app with make_server(), which registers
+the tools every database gets plus any database-specific ones.
+"""
+import io
+import os
+import re
+import csv
+import asyncio
+import time
+import queue
+import logging
+import types
+import functools
+from contextlib import contextmanager
+from mcp.server.fastmcp import FastMCP
+from mssql_mcp_server import _driver
+from typing import Any, Union
+
+logger = logging.getLogger("mssql_mcp_server")
+
+_TABLE_NAME_RE = re.compile(r'^[A-Za-z0-9_]+(?:\.[A-Za-z0-9_]+)?\Z')
+
+@functools.lru_cache(maxsize=256)
+def validate_table_name(table_name: str) -> str:
+    """Validate and escape table name to prevent SQL injection."""
+    if not _TABLE_NAME_RE.match(table_name):
+        raise ValueError(f"Invalid table name: {table_name}")
+    parts = table_name.split('.')
+    if len(parts) == 2:
+        return f"[{parts[0]}].[{parts[1]}]"
+    else:
+        return f"[{table_name}]"
+
+_CACHED_CONFIG = None
+
+def _calculate_db_config():
+    """Build database configuration from environment variables."""
+    server = os.getenv("MSSQL_SERVER", "localhost")
+    logger.info(f"MSSQL_SERVER environment variable: {os.getenv('MSSQL_SERVER', 'NOT SET')}")
+    logger.info(f"Using server: {server}")
+
+    if server.startswith("(localdb)\\"):
+        instance_name = server.replace("(localdb)\\", "")
+        server = f".\\{instance_name}"
+        logger.info(f"Detected LocalDB connection, converted to: {server}")
+
+    config = {
+        "server": server,
+        "user": os.getenv("MSSQL_USER"),
+        "password": os.getenv("MSSQL_PASSWORD"),
+        "database": os.getenv("MSSQL_DATABASE"),
+        "port": int(os.getenv("MSSQL_PORT", "1433")),
+    }
+    encrypt_str = os.getenv("MSSQL_ENCRYPT", "false")
+    #config["encrypt"] = encrypt_str.lower() == "true"
+    use_windows_auth = os.getenv("MSSQL_WINDOWS_AUTH", "false").lower() == "true"
+    if use_windows_auth:
+        if not config["database"]:
+            logger.error("MSSQL_DATABASE is required")
+            raise ValueError("Missing required database configuration")
+        config.pop("user", None)
+        config.pop("password", None)
+        logger.info("Using Windows Authentication")
+    else:
+        if not all([config["user"], config["password"], config["database"]]):
+            logger.error("Missing required database configuration. Please check environment variables:")
+            logger.error("MSSQL_USER, MSSQL_PASSWORD, and MSSQL_DATABASE are required")
+            raise ValueError("Missing required database configuration")
+    return config
+
+def get_db_config(reset_cache=False):
+    """Get database configuration, read from the environment once per process."""
+    global _CACHED_CONFIG
+    if _CACHED_CONFIG is None or reset_cache:
+        _CACHED_CONFIG = types.MappingProxyType(_calculate_db_config())
+    return _CACHED_CONFIG
+
+# Connection pool: idle connections are kept as (connection, opened_at, autocommit)
+# so the TDS handshake/login is paid once per connection, not once per tool call.
+# At least one slot: 0 would make _DB_SLOTS block every call and _POOL unbounded.
+MSSQL_POOL_SIZE = max(1, int(os.getenv("MSSQL_POOL_SIZE", "10")))
+MSSQL_POOL_RECYCLE = int(os.getenv("MSSQL_POOL_RECYCLE", "1800"))
+_POOL: queue.Queue[tuple[Any, float, bool]] = queue.Queue(maxsize=MSSQL_POOL_SIZE)
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+def _release_conn(conn, opened_at, autocommit):
+    """Roll back any open transaction and hand the connection back to the pool."""
+    if not autocommit:
+        try:
+            conn.rollback()
+        except _driver.Error as e:
+            logger.warning(f"Discarding broken pooled connection: {e}")
+            _close_quietly(conn)
+            return
+    try:
+        _POOL.put_nowait((conn, opened_at, autocommit))
+    except queue.Full:
+        _close_quietly(conn)
+
+def _discard_idle():
+    """Close every idle pooled connection."""
+    while True:
+        try:
+            conn, _, _ = _POOL.get_nowait()
+        except queue.Empty:
+            return
+        _close_quietly(conn)
+
+@contextmanager
+def acquire_conn(autocommit=False, fresh=False):
+    """
+    Borrow a connection from the pool, opening a new one if none is idle (or if
+    fresh is set). Read-only callers pass autocommit=True so SQL Server never
+    opens an implicit transaction for them. The mode stays with the pooled
+    connection and is only switched when the next borrower wants the other one.
+    """
+    conn = None
+    while conn is None:
+        pooled = not fresh
+        try:
+            if fresh:
+                raise queue.Empty
+            conn, opened_at, conn_autocommit = _POOL.get_nowait()
+        except queue.Empty:
+            pooled = False
+            conn, opened_at, conn_autocommit = _driver.connect(get_db_config()), time.monotonic(), False
+        else:
+            if time.monotonic() - opened_at > MSSQL_POOL_RECYCLE:
+                _close_quietly(conn)
+                conn = None
+                continue
+        if conn_autocommit != autocommit:
+            # The switch is the first roundtrip (pymssql sends a ROLLBACK), so a
+            # connection that died while idle fails here and is replaced.
+            try:
+                _driver.set_autocommit(conn, autocommit)
+            except BaseException as e:
+                lost = _driver.connection_lost(conn, e)
+                _close_quietly(conn)
+                if not (pooled and lost):
+                    raise
+                logger.warning(f"Connection lost, discarding idle pooled connections: {e}")
+                _discard_idle()
+                conn = None
+                continue
+            conn_autocommit = autocommit
+    try:
+        yield conn
+    except BaseException as e:
+        if _driver.connection_lost(conn, e):
+            # The idle connections were most likely cut off by the same restart or failover.
+            logger.warning(f"Connection lost, discarding idle pooled connections: {e}")
+            _close_quietly(conn)
+            _discard_idle()
+        else:
+            _release_conn(conn, opened_at, conn_autocommit)
+        raise
+    _release_conn(conn, opened_at, conn_autocommit)
+
+@contextmanager
+def _private_conn():
+    """
+    Open a connection that is closed afterwards instead of pooled. Arbitrary SQL
+    can leave session state behind (USE, SET ROWCOUNT/LANGUAGE/DATEFORMAT,
+    #temp tables) that must not reach the next tool borrowing the connection.
+    """
+    conn = _driver.connect(get_db_config())
+    try:
+        yield conn
+    finally:
+        _close_quietly(conn)
+
+# Rows are pulled in fetchmany() batches of this size so the CSV writer runs
+# while the rest of the result set is still arriving.
+MSSQL_FETCH_SIZE = int(os.getenv("MSSQL_FETCH_SIZE", "1000"))
+
+def _open_cursor(conn):
+    cursor = conn.cursor()
+    cursor.arraysize = MSSQL_FETCH_SIZE
+    return cursor
+
+@functools.lru_cache(maxsize=128)
+def _csv_header(description):
+    """
+    Format the CSV header line for a cursor description. Keyed on the full
+    description rather than the SQL text, so a changed schema never reuses a stale header.
+    """
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerow([desc[0] for desc in description])
+    return buf.getvalue()
+
+def _write_csv(buf, cursor, max_rows=0):
+    """
+    Stream the current result set into buf as CSV, stopping after max_rows rows
+    when max_rows > 0. Returns the number of rows written.
+    """
+    buf.write(_csv_header(tuple(cursor.description)))
+    writer = csv.writer(buf, lineterminator="\n")
+    row_count = 0
+    while True:
+        size = min(MSSQL_FETCH_SIZE, max_rows - row_count) if max_rows else MSSQL_FETCH_SIZE
+        if size <= 0:
+            break
+        batch = cursor.fetchmany(size)
+        if not batch:
+            break
+        writer.writerows(batch)
+        row_count += len(batch)
+    return row_count
+
+def _cursor_to_csv(cursor, max_rows=0):
+    """Stream the current result set into CSV text. Returns (csv_text, row_count)."""
+    # MCP text content must be str, so everything goes into one StringIO and is
+    # copied out exactly once.
+    buf = io.StringIO()
+    row_count = _write_csv(buf, cursor, max_rows)
+    return buf.getvalue(), row_count
+
+def _run_read(work):
+    """
+    Call work(conn) with an autocommit connection and return its result.
+    Autocommit connections skip the rollback on release, so a connection that
+    died while idle (server restart, failover) is only noticed here; in that
+    case work runs once more on a new connection. work must only read, and must
+    not hand out rows before it returns, so repeating it is safe.
+    """
+    lost = False
+    try:
+        with acquire_conn(autocommit=True) as conn:
+            try:
+                return work(conn)
+            except _driver.Error as e:
+                lost = _driver.connection_lost(conn, e)
+                raise
+    except _driver.Error:
+        if not lost:
+            raise
+    with acquire_conn(autocommit=True, fresh=True) as conn:
+        return work(conn)
+
+def _query_csv(sql, params=None, max_rows=0):
+    """Run a read-only query on a pooled connection. Returns (csv_text, row_count)."""
+    def work(conn):
+        cursor = _open_cursor(conn)
+        started = time.perf_counter()
+        if params is None:
+            cursor.execute(sql)
+        else:
+            cursor.execute(_driver.format_query(sql), params)
+        executed = time.perf_counter()
+        result = _cursor_to_csv(cursor, max_rows)
+        cursor.close()
+        logger.debug(f"Query took {executed - started:.3f}s, fetching/formatting {result[1]} rows "
+                     f"took {time.perf_counter() - executed:.3f}s")
+        return result
+
+    return _run_read(work)
+
+# pymssql calls block, so they run in worker threads; the semaphore keeps the
+# number of threads holding a connection at the pool size.
+_DB_SLOTS = asyncio.Semaphore(MSSQL_POOL_SIZE)
+
+async def _run_blocking(func, *args):
+    """Run a blocking database call off the event loop."""
+    async with _DB_SLOTS:
+        return await asyncio.to_thread(func, *args)
+
+# Request coalescing: concurrent count_user_logins calls share one roundtrip.
+MSSQL_BATCH_MAX = min(int(os.getenv("MSSQL_BATCH_MAX", "64")), 1000)
+MSSQL_BATCH_MS = float(os.getenv("MSSQL_BATCH_MS", "5"))
+
+class _LoginCountBatcher:
+    """Collect concurrent count_user_logins calls and answer them with one query per year."""
+
+    def __init__(self):
+        self._queue = None
+        self._worker = None
+        self._dispatches = set()
+
+    async def count(self, user_id, year):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+        future = loop.create_future()
+        self._queue.put_nowait((user_id, year, future))
+        return await future
+
+    async def _run(self, pending):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await pending.get()]
+            deadline = loop.time() + MSSQL_BATCH_MS / 1000
+            while len(batch) < MSSQL_BATCH_MAX:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(pending.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            by_year = {}
+            for user_id, year, future in batch:
+                by_year.setdefault(year, []).append((user_id, future))
+            for year, waiters in by_year.items():
+                task = loop.create_task(self._dispatch(year, waiters))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, year, waiters):
+        user_ids = list(dict.fromkeys(user_id for user_id, _ in waiters))
+        try:
+            counts = await _run_blocking(_fetch_login_counts, user_ids, year)
+        except Exception as e:
+            if len(user_ids) > 1:
+                # Rerun each user on its own so one bad user_id only fails its own callers.
+                await asyncio.gather(*(
+                    self._dispatch(year, [w for w in waiters if w[0] == user_id]) for user_id in user_ids))
+                return
+            for _, future in waiters:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for user_id, future in waiters:
+                if not future.done():
+                    future.set_result(counts[user_id])
+
+def _fetch_login_counts(user_ids, year):
+    """Count security log rows for several users in a year with a single query."""
+    values = ", ".join(f"({i}, %s)" for i in range(len(user_ids)))
+    sql = f"""
+    SELECT v.idx, COUNT(l.user_id) AS appearances
+    FROM (VALUES {values}) AS v(idx, user_id)
+    LEFT JOIN am_user_security_log l
+        ON l.user_id = v.user_id
+        AND l.date_time >= %s
+        AND l.date_time < %s
+    GROUP BY v.idx;
+    """
+    # Half-open range instead of YEAR(date_time) so an index on date_time can seek.
+    # YYYYMMDD literals are read the same way regardless of the session DATEFORMAT.
+    year_start, next_year_start = f"{year:04d}0101", f"{year + 1:04d}0101"
+
+    def work(conn):
+        cursor = _open_cursor(conn)
+        cursor.execute(_driver.format_query(sql), (*user_ids, year_start, next_year_start))
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    by_idx = dict(_run_read(work))
+    return {user_id: by_idx.get(i, 0) for i, user_id in enumerate(user_ids)}
+
+_login_counts = _LoginCountBatcher()
+
+async def execute_sql(query: str, max_rows: int = 0) -> str:
+    """
+    Execute an SQL query on the MSSQL server.
+    Args:
+        query: The SQL query to execute.
+        max_rows: Return at most this many rows of a SELECT (0 = no limit).
+            Use OFFSET ... FETCH NEXT ... ROWS ONLY in the query to page further.
+    Returns:
+        Results as CSV text or an error message.
+    """
+    try:
+        return await _run_blocking(_run_sql, query, max_rows)
+    except Exception as e:
+        logger.error(f"Error executing SQL '{query}': {e}")
+        return f"Error executing query: {str(e)}"
+
+def _run_sql(query: str, max_rows: int) -> str:
+    with _private_conn() as conn:
+        cursor = _open_cursor(conn)
+        started = time.perf_counter()
+        cursor.execute(query)
+        if cursor.description:  # SELECT
+            executed = time.perf_counter()
+            output, row_count = _cursor_to_csv(cursor, max_rows)
+            logger.debug(f"Query took {executed - started:.3f}s, fetching/formatting {row_count} rows "
+                         f"took {time.perf_counter() - executed:.3f}s")
+        else:
+            conn.commit()
+            affected_rows = cursor.rowcount
+            output = f"Query executed successfully. Rows affected: {affected_rows}"
+        cursor.close()
+    return output
+
+async def count_user_logins(user_id: str, year: Union[str, int]) -> str:
+    """
+    Count how many times a user_id appears in am_user_security_log in a given year.
+    Args:
+        user_id: User ID to search for.
+        year: Year to look under.
+    Returns:
+        Number of appearances as string or error message.
+    """
+    try:
+        if not str(year).strip().isdecimal():
+            raise ValueError(f"Invalid year: {year}")
+        year = int(year)
+        count = await _login_counts.count(user_id, year)
+        return f"{user_id} appeared {count} times in {year}"
+    except Exception as e:
+        logger.error(f"Error executing count_user_logins: {e}")
+        return f"Error: {str(e)}"
+
+async def list_sql_tables() -> str:
+    """
+    List all SQL Server user tables in the connected database.
+    Returns:
+        A CSV string of table names, or an error message.
+    """
+    sql = """
+    SELECT TABLE_SCHEMA AS [Schema], TABLE_NAME AS [Table]
+    FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_TYPE = 'BASE TABLE'
+    ORDER BY TABLE_SCHEMA, TABLE_NAME;
+    """
+    try:
+        output, row_count = await _run_blocking(_query_csv, sql)
+        if not row_count:
+            return "No tables found in this database."
+        return output
+    except Exception as e:
+        logger.error(f"Error listing tables: {e}")
+        return f"Error listing tables: {str(e)}"
+
+PREVIEW_ROWS = 100
+
+@functools.lru_cache(maxsize=256)
+def _preview_sql(table_name: str) -> str:
+    """
+    Build the preview query once per table. The row count stays a parameter so
+    every preview of a table sends the same text (TOP already sets the row goal,
+    so no FAST hint is needed).
+    """
+    return f"SELECT TOP (%s) * FROM {validate_table_name(table_name)}"
+
+async def read_table_preview(table_name: str) -> str:
+    """
+    Preview up to 100 rows from a specified SQL Server table.
+    Args:
+        table_name: Name of the table to preview (optionally schema-qualified, e.g., 'dbo.my_table').
+    Returns:
+        A CSV string of up to 100 rows, or an error message.
+    """
+    try:
+        # Validate the table name to prevent SQL injection
+        sql = _preview_sql(table_name)
+        output, row_count = await _run_blocking(_query_csv, sql, (PREVIEW_ROWS,))
+        if not row_count:
+            return "No data found in this table."
+        return output
+    except Exception as e:
+        logger.error(f"Error reading table '{table_name}': {e}")
+        return f"Error reading table '{table_name}': {str(e)}"
+
+MAX_PREVIEW_TABLES = 32
+
+def _preview_many(table_names):
+    """Preview several tables in one batch, reading one result set per table."""
+    sql = ";\n".join(_preview_sql(name) for name in table_names)
+    params = (PREVIEW_ROWS,) * len(table_names)
+
+    def work(conn):
+        buf = io.StringIO()
+        cursor = _open_cursor(conn)
+        cursor.execute(_driver.format_query(sql), params)
+        for i, name in enumerate(table_names):
+            if i:
+                cursor.nextset()
+                buf.write("\n")
+            buf.write(f"Table: {name}\n")
+            start = buf.tell()
+            if not _write_csv(buf, cursor):
+                buf.seek(start)
+                buf.truncate()
+                buf.write("No data found in this table.\n")
+        cursor.close()
+        return buf.getvalue()
+
+    return _run_read(work)
+
+async def preview_tables(table_names: list[str]) -> str:
+    """
+    Preview up to 100 rows from each of several SQL Server tables in a single roundtrip.
+    Args:
+        table_names: Tables to preview (optionally schema-qualified), at most 32.
+    Returns:
+        One 'Table: <name>' section of CSV per table, or an error message.
+    """
+    try:
+        table_names = list(dict.fromkeys(table_names))
+        if not table_names:
+            raise ValueError("No table names given")
+        if len(table_names) > MAX_PREVIEW_TABLES:
+            raise ValueError(f"At most {MAX_PREVIEW_TABLES} tables can be previewed at once")
+        for name in table_names:
+            # Validate every table name to prevent SQL injection
+            validate_table_name(name)
+        return await _run_blocking(_preview_many, table_names)
+    except Exception as e:
+        logger.error(f"Error previewing tables {table_names}: {e}")
+        return f"Error previewing tables: {str(e)}"
+
+_PONG = "pong"
+
+# FastMCP calls plain functions inline, so a sync ping skips creating and
+# scheduling a coroutine for every health check.
+def ping() -> str:
+    "Returns pong."
+    return _PONG
+
+
+SHARED_TOOLS = (execute_sql, count_user_logins, list_sql_tables, read_table_preview, preview_tables, ping)
+
+def make_server(name: str, *, extra_tools=()) -> FastMCP:
+    """Build a FastMCP server with the shared tools plus any per-database tools."""
+    mcp = FastMCP(name)
+    for tool in (*SHARED_TOOLS, *extra_tools):
+        mcp.tool()(tool)
+    return mcp
@@ -0,0 +1,106 @@
+"""Database driver selection for the MSSQL MCP servers.
+
+MSSQL_DRIVER picks the backend:
+    pymssql       FreeTDS based driver (default).
+    mssql_python  Microsoft's driver built on the native ODBC client, with
+                  driver-level connection pooling.
+"""
+import os
+import logging
+
+logger = logging.getLogger("mssql_mcp_driver")
+
+DRIVER = os.getenv("MSSQL_DRIVER", "pymssql").strip().lower()
+
+if DRIVER not in ("pymssql", "mssql_python"):
+    raise ValueError(f"Unsupported MSSQL_DRIVER: {DRIVER} (expected 'pymssql' or 'mssql_python')")
+
+# The driver module (and its native library) is imported on first use, so
+# importing the package for e.g. validate_table_name does not load FreeTDS.
+_backend = None
+
+def _load():
+    """Import and set up the configured driver module."""
+    global _backend
+    if _backend is None:
+        if DRIVER == "mssql_python":
+            import mssql_python
+
+            mssql_python.pooling(
+                max_size=max(1, int(os.getenv("MSSQL_POOL_SIZE", "10"))),
+                idle_timeout=int(os.getenv("MSSQL_POOL_RECYCLE", "1800")),
+            )
+            _backend = mssql_python
+        else:
+            import pymssql
+
+            _backend = pymssql
+        logger.info(f"Using database driver: {DRIVER}")
+    return _backend
+
+def __getattr__(name):
+    # Error, InterfaceError and OperationalError resolve to the active driver's classes.
+    if name in ("Error", "InterfaceError", "OperationalError"):
+        return getattr(_load(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _odbc_value(value) -> str:
+    """Brace-quote a connection string value so ';' and '}' cannot break out of it."""
+    return "{" + str(value).replace("}", "}}") + "}"
+
+def _connection_string(config) -> str:
+    """Translate the pymssql style config mapping into an ODBC connection string."""
+    server = config["server"]
+    if "\\" not in server:  # named instances resolve their own port
+        server = f"{server},{config.get('port', 1433)}"
+    parts = [f"Server={_odbc_value(server)}", f"Database={_odbc_value(config['database'])}"]
+    if config.get("user"):
+        parts.append(f"UID={_odbc_value(config['user'])}")
+        parts.append(f"PWD={_odbc_value(config['password'])}")
+    else:
+        parts.append("Trusted_Connection=yes")
+    parts.append("Encrypt=yes" if config.get("encrypt") else "Encrypt=no")
+    return ";".join(parts)
+
+def connect(config):
+    """Open a DB-API connection with the configured driver."""
+    if DRIVER == "mssql_python":
+        return _load().connect(_connection_string(config))
+    return _load().connect(**config)
+
+def set_autocommit(conn, enabled: bool):
+    """Switch a connection in or out of autocommit mode."""
+    if DRIVER == "mssql_python":
+        conn.autocommit = enabled
+    else:
+        conn.autocommit(enabled)
+
+# FreeTDS message numbers for a dead or unreachable server; pymssql raises
+# OperationalError for these and for ordinary server errors alike.
+_FREETDS_CONNECTION_ERRORS = frozenset({20003, 20004, 20006, 20009, 20017, 20047})
+
+def connection_lost(conn, exc) -> bool:
+    """
+    Tell whether exc means conn itself is unusable, as opposed to an error in
+    the statement (conversion, overflow, constraint) that leaves it healthy.
+    """
+    backend = _load()
+    if isinstance(exc, backend.InterfaceError):
+        return True
+    if not isinstance(exc, backend.OperationalError):
+        return False
+    if DRIVER == "mssql_python":
+        # SQLSTATE class 08 is "connection exception".
+        return str(getattr(exc, "sqlstate", "") or "").startswith("08") or "08S01" in str(exc)
+    if getattr(getattr(conn, "_conn", None), "connected", True) is False:
+        return True
+    return bool(exc.args) and exc.args[0] in _FREETDS_CONNECTION_ERRORS
+
+def format_query(sql: str) -> str:
+    """
+    Adapt a query written with pymssql's %s placeholders to the active driver.
+    Only use this on queries that are executed with parameters.
+    """
+    if DRIVER == "mssql_python":
+        return sql.replace("%s", "?")
+    return sql
@@ -2,6 +2,48 @@
 import pytest
 import os
 import pymssql
+from unittest.mock import patch
+from mssql_mcp_server import _common
+
+DB_ENV = {
+    'MSSQL_USER': 'testuser',
+    'MSSQL_PASSWORD': 'testpass',
+    'MSSQL_DATABASE': 'testdb'
+}
+
+@pytest.fixture(autouse=True)
+def reset_db_config_cache():
+    """Make every test read database configuration from its own environment."""
+    _common._CACHED_CONFIG = None
+    yield
+    _common._CACHED_CONFIG = None
+
+@pytest.fixture(autouse=True)
+def empty_pool():
+    """Keep pooled mock connections from leaking between tests."""
+    def drain():
+        while not _common._POOL.empty():
+            _common._POOL.get_nowait()
+    drain()
+    yield
+    drain()
+
+@pytest.fixture
+def db_env():
+    """Provide the SQL authentication settings tools need to open a connection."""
+    with patch.dict(os.environ, DB_ENV):
+        yield
+
+@pytest.fixture
+def mock_connect(db_env):
+    """Patch pymssql.connect; unless a test changes it, every call returns mock_conn."""
+    with patch('pymssql.connect') as connect:
+        yield connect
+
+@pytest.fixture
+def mock_conn(mock_connect):
+    """The mock connection handed out by the patched pymssql.connect."""
+    return mock_connect.return_value
 
 @pytest.fixture(scope="session")
 def mssql_connection():
@@ -0,0 +1,94 @@
+"""Test coalescing of concurrent tool calls into shared roundtrips."""
+import pytest
+import asyncio
+import time
+import pymssql
+from mssql_mcp_server import server
+
+
+class TestLoginCountBatching:
+    """Test batching of count_user_logins."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_query(self, mock_conn):
+        """Test that concurrent calls for one year run a single query."""
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.fetchall.return_value = [(0, 3), (1, 5)]
+        results = await asyncio.gather(
+            server.count_user_logins('alice', 2024),
+            server.count_user_logins('bob', '2024'),
+            server.count_user_logins('alice', 2024),
+        )
+        assert results == [
+            'alice appeared 3 times in 2024',
+            'bob appeared 5 times in 2024',
+            'alice appeared 3 times in 2024',
+        ]
+        mock_cursor.execute.assert_called_once()
+        sql, params = mock_cursor.execute.call_args[0]
+        assert 'VALUES (0, %s), (1, %s)' in sql
+        assert params == ('alice', 'bob', '20240101', '20250101')
+        assert 'YEAR(' not in sql
+
+    @pytest.mark.asyncio
+    async def test_users_without_rows_count_zero(self, mock_conn):
+        """Test that users missing from the result count as zero."""
+        mock_conn.cursor.return_value.fetchall.return_value = []
+        result = await server.count_user_logins('nobody', 2024)
+        assert result == 'nobody appeared 0 times in 2024'
+
+    @pytest.mark.asyncio
+    async def test_invalid_year_rejected(self, mock_connect):
+        """Test that a non-numeric year never reaches the database."""
+        result = await server.count_user_logins('alice', "2024' OR 1=1 --")
+        assert result.startswith('Error: Invalid year')
+        mock_connect.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_only_the_failing_caller(self, mock_conn):
+        """Test that a failed batch is retried per user so only the bad call errors."""
+        def execute(sql, params):
+            if 'bad' in params:
+                raise pymssql.OperationalError(245, b'Conversion failed')
+
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.execute.side_effect = execute
+        mock_cursor.fetchall.return_value = [(0, 3)]
+        results = await asyncio.gather(
+            server.count_user_logins('alice', 2024),
+            server.count_user_logins('bad', 2024),
+            server.count_user_logins('alice', 2024),
+        )
+        assert results[0] == results[2] == 'alice appeared 3 times in 2024'
+        assert results[1].startswith('Error:')
+        assert mock_cursor.execute.call_count == 3
+
+
+class TestQueryExecution:
+    """Test that execute_sql never shares results between callers."""
+
+    @pytest.mark.asyncio
+    async def test_identical_selects_each_execute(self, mock_conn):
+        """Test that concurrent identical SELECTs run separately."""
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.description = [('id',)]
+        mock_cursor.execute.side_effect = lambda *args: time.sleep(0.05)
+        mock_cursor.fetchmany.side_effect = [[(1,)], [], [(2,)], []]
+        results = await asyncio.gather(
+            server.execute_sql('SELECT NEWID()'),
+            server.execute_sql('SELECT NEWID()'),
+        )
+        assert sorted(results) == ['id\n1\n', 'id\n2\n']
+        assert mock_cursor.execute.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_writes_are_not_shared(self, mock_conn):
+        """Test that identical writes each execute."""
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.description = None
+        mock_cursor.rowcount = 1
+        await asyncio.gather(
+            server.execute_sql('SELECT 1 DELETE FROM log'),
+            server.execute_sql('SELECT 1 DELETE FROM log'),
+        )
+        assert mock_cursor.execute.call_count == 2
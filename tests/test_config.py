@@ -120,6 +120,29 @@ class TestDatabaseConfiguration:
             config = get_db_config()
             assert config['encrypt'] == False
 
+    def test_configuration_is_cached(self):
+        """Test that the environment is only read on the first call."""
+        with patch.dict(os.environ, {
+            'MSSQL_USER': 'testuser',
+            'MSSQL_PASSWORD': 'testpass',
+            'MSSQL_DATABASE': 'testdb'
+        }):
+            config = get_db_config()
+            with patch.dict(os.environ, {'MSSQL_DATABASE': 'otherdb'}):
+                assert get_db_config() is config
+                assert get_db_config(reset_cache=True)['database'] == 'otherdb'
+
+    def test_cached_configuration_is_read_only(self):
+        """Test that callers cannot mutate the shared configuration."""
+        with patch.dict(os.environ, {
+            'MSSQL_USER': 'testuser',
+            'MSSQL_PASSWORD': 'testpass',
+            'MSSQL_DATABASE': 'testdb'
+        }):
+            config = get_db_config()
+            with pytest.raises(TypeError):
+                config['database'] = 'otherdb'
+
 
 class TestTableNameValidation:
     """Test SQL table name validation and escaping."""
@@ -152,6 +175,7 @@ class TestTableNameValidation:
             'schema.name.table',         # Too many dots
             'user@table',                # Invalid character
             'user#table',                # Invalid character
+            'users\n',                   # Trailing newline
             '',                          # Empty
             '.',                         # Just dot
             '..',                        # Double dot
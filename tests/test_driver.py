@@ -0,0 +1,67 @@
+"""Test database driver selection helpers."""
+import subprocess
+import sys
+from mssql_mcp_server import _driver
+
+
+class TestConnectionString:
+    """Test translation of the config mapping into an ODBC connection string."""
+
+    def test_sql_authentication(self):
+        """Test server, port and credentials are included."""
+        conn_str = _driver._connection_string({
+            'server': 'db.example.com',
+            'port': 1433,
+            'user': 'testuser',
+            'password': 'p;a}ss',
+            'database': 'testdb'
+        })
+        assert 'Server={db.example.com,1433}' in conn_str
+        assert 'UID={testuser}' in conn_str
+        assert 'PWD={p;a}}ss}' in conn_str
+        assert 'Encrypt=no' in conn_str
+
+    def test_windows_authentication_named_instance(self):
+        """Test named instances keep their name and use a trusted connection."""
+        conn_str = _driver._connection_string({
+            'server': '.\\MSSQLLocalDB',
+            'port': 1433,
+            'database': 'testdb'
+        })
+        assert 'Server={.\\MSSQLLocalDB}' in conn_str
+        assert 'Trusted_Connection=yes' in conn_str
+        assert 'UID=' not in conn_str
+
+
+class TestFormatQuery:
+    """Test placeholder translation for the active driver."""
+
+    def test_pymssql_keeps_placeholders(self, monkeypatch):
+        """Test that pymssql queries are passed through unchanged."""
+        monkeypatch.setattr(_driver, 'DRIVER', 'pymssql')
+        assert _driver.format_query('SELECT %s, %s') == 'SELECT %s, %s'
+
+    def test_mssql_python_uses_qmark(self, monkeypatch):
+        """Test that mssql_python queries use ? placeholders."""
+        monkeypatch.setattr(_driver, 'DRIVER', 'mssql_python')
+        assert _driver.format_query('SELECT %s, %s') == 'SELECT ?, ?'
+
+
+class TestLazyImport:
+    """Test that the native driver is only loaded when a connection is needed."""
+
+    def test_package_import_does_not_load_driver(self):
+        """Test that importing the servers leaves pymssql unloaded."""
+        code = (
+            "import sys\n"
+            "from mssql_mcp_server.server import validate_table_name\n"
+            "from mssql_mcp_server import server_jumbos, server_agencies\n"
+            "assert validate_table_name('dbo.users') == '[dbo].[users]'\n"
+            "assert 'pymssql' not in sys.modules\n"
+        )
+        subprocess.run([sys.executable, '-c', code], check=True)
+
+    def test_error_classes_come_from_driver(self):
+        """Test that driver exception names resolve to the active driver's classes."""
+        import pymssql
+        assert _driver.InterfaceError is pymssql.InterfaceError
@@ -0,0 +1,156 @@
+"""Test CSV formatting of query results."""
+import pytest
+from unittest.mock import Mock
+from mssql_mcp_server import server, _common
+
+
+def make_cursor(columns, rows, batch_size=2):
+    """Build a mock cursor serving rows through fetchmany in small batches."""
+    cursor = Mock()
+    cursor.description = [(name,) for name in columns]
+    remaining = list(rows)
+
+    def fetchmany(size):
+        batch = remaining[:min(size, batch_size)]
+        del remaining[:len(batch)]
+        return batch
+
+    cursor.fetchmany.side_effect = fetchmany
+    return cursor
+
+
+class TestCsvOutput:
+    """Test conversion of result sets to CSV text."""
+
+    def test_rows_are_streamed_in_batches(self):
+        """Test that every batch from fetchmany is written."""
+        cursor = make_cursor(['id', 'name'], [(i, f'user_{i}') for i in range(5)])
+        output, row_count = _common._cursor_to_csv(cursor)
+        assert row_count == 5
+        assert output.splitlines()[0] == 'id,name'
+        assert output.splitlines()[-1] == '4,user_4'
+        cursor.fetchall.assert_not_called()
+
+    def test_values_are_quoted(self):
+        """Test that commas, quotes and newlines in values keep the CSV intact."""
+        cursor = make_cursor(['id', 'note'], [(1, 'a,b'), (2, 'say "hi"'), (3, 'two\nlines')])
+        output, _ = _common._cursor_to_csv(cursor)
+        assert output == 'id,note\n1,"a,b"\n2,"say ""hi"""\n3,"two\nlines"\n'
+
+    @pytest.mark.asyncio
+    async def test_read_table_preview_empty_table(self, mock_conn):
+        """Test the message returned for a table without rows."""
+        mock_conn.cursor.return_value = make_cursor(['id'], [])
+        result = await server.read_table_preview('users')
+        assert result == 'No data found in this table.'
+
+    @pytest.mark.asyncio
+    async def test_read_table_preview_query(self, mock_conn):
+        """Test that the preview row count is sent as a parameter."""
+        mock_conn.cursor.return_value = make_cursor(['id'], [(1,)])
+        result = await server.read_table_preview('dbo.users')
+        assert result == 'id\n1\n'
+        assert mock_conn.cursor.return_value.arraysize == _common.MSSQL_FETCH_SIZE
+        mock_conn.cursor.return_value.execute.assert_called_once_with(
+            'SELECT TOP (%s) * FROM [dbo].[users]', (100,))
+
+    @pytest.mark.asyncio
+    async def test_read_table_preview_invalid_name(self, mock_connect):
+        """Test that invalid table names are rejected before querying."""
+        result = await server.read_table_preview('users; DROP TABLE users')
+        assert 'Invalid table name' in result
+        mock_connect.assert_not_called()
+
+    def test_header_cached_per_result_shape(self):
+        """Test that the header line is formatted once per distinct description."""
+        _common._csv_header.cache_clear()
+        for _ in range(3):
+            output, _ = _common._cursor_to_csv(make_cursor(['id', 'name'], [(1, 'a')]))
+            assert output == 'id,name\n1,a\n'
+        output, _ = _common._cursor_to_csv(make_cursor(['id', 'email'], [(1, 'a')]))
+        assert output == 'id,email\n1,a\n'
+        info = _common._csv_header.cache_info()
+        assert (info.hits, info.misses) == (2, 2)
+
+    def test_max_rows_stops_fetching(self):
+        """Test that max_rows caps the rows written and fetched."""
+        cursor = make_cursor(['id'], [(i,) for i in range(10)])
+        output, row_count = _common._cursor_to_csv(cursor, max_rows=3)
+        assert row_count == 3
+        assert output == 'id\n0\n1\n2\n'
+        assert all(call.args[0] <= 3 for call in cursor.fetchmany.call_args_list)
+
+
+class TestPreviewTables:
+    """Test previewing several tables in one roundtrip."""
+
+    @pytest.mark.asyncio
+    async def test_one_batch_for_all_tables(self, mock_conn):
+        """Test that every table is read from its own result set of one batch."""
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.description = [('id',)]
+        mock_cursor.fetchmany.side_effect = [[(1,)], [], [], [(2,)], []]
+        result = await server.preview_tables(['users', 'dbo.empty', 'orders'])
+        assert result == (
+            'Table: users\nid\n1\n\n'
+            'Table: dbo.empty\nNo data found in this table.\n\n'
+            'Table: orders\nid\n2\n'
+        )
+        sql, params = mock_cursor.execute.call_args[0]
+        assert sql.count('SELECT TOP (%s)') == 3
+        assert params == (100, 100, 100)
+        assert mock_cursor.nextset.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_invalid_or_too_many_tables(self, mock_connect):
+        """Test that bad names and oversized lists are rejected before querying."""
+        bad_name = await server.preview_tables(['users', 'users; DROP TABLE users'])
+        too_many = await server.preview_tables([f't{i}' for i in range(33)])
+        assert 'Invalid table name' in bad_name
+        assert too_many.startswith('Error previewing tables')
+        mock_connect.assert_not_called()
+
+
+class TestReportPaging:
+    """Test server-side paging of the trial balance report."""
+
+    @pytest.mark.asyncio
+    async def test_unpaged_report(self, mock_conn):
+        """Test that the full report is requested without OFFSET by default."""
+        mock_conn.cursor.return_value = make_cursor(['Date'], [])
+        await server.report_trial_balance_by_seg_ref('2024-01-01', '2024-12-31', '7206%')
+        sql, params = mock_conn.cursor.return_value.execute.call_args[0]
+        assert 'OFFSET' not in sql
+        assert 'journal_entry_detail_id' not in sql
+        for column in ('[Debits]', '[Credits]', '[Ending Balance]'):
+            assert f', 2) AS {column}' in sql
+        assert params == ('2024-01-01', '2024-12-31', '7206%')
+
+    @pytest.mark.asyncio
+    async def test_paged_report(self, mock_conn):
+        """Test that offset and max_rows become OFFSET/FETCH parameters."""
+        mock_conn.cursor.return_value = make_cursor(['Date'], [])
+        await server.report_trial_balance_by_seg_ref(
+            '2024-01-01', '2024-12-31', '7206%', offset=500, max_rows=250)
+        sql, params = mock_conn.cursor.return_value.execute.call_args[0]
+        assert sql.rstrip().endswith('OFFSET %s ROWS FETCH NEXT %s ROWS ONLY')
+        assert params[-2:] == (500, 250)
+
+    @pytest.mark.asyncio
+    async def test_paged_report_has_unique_order(self, mock_conn):
+        """Test that pages are ordered down to the detail row, not just the entry."""
+        mock_conn.cursor.return_value = make_cursor(['Date'], [])
+        await server.report_trial_balance_by_seg_ref(
+            '2024-01-01', '2024-12-31', '7206%', offset=500, max_rows=250)
+        sql, _ = mock_conn.cursor.return_value.execute.call_args[0]
+        outer_order = sql[sql.rindex('ORDER BY'):sql.index('OFFSET')]
+        assert outer_order.split() == [
+            'ORDER', 'BY', 'je.transaction_date,', 'je.journal_entry_id,', 'jed.journal_entry_detail_id']
+        assert 'OVER (ORDER BY je.transaction_date, je.journal_entry_id)' in sql
+
+    @pytest.mark.asyncio
+    async def test_negative_paging_rejected(self):
+        """Test that negative paging values return an error."""
+        result = await server.report_trial_balance_by_seg_ref(
+            '2024-01-01', '2024-12-31', '7206%', offset=-1)
+        assert result.startswith('Error:')
@@ -0,0 +1,174 @@
+"""Test connection pooling behaviour of the FastMCP servers."""
+import pytest
+import os
+import subprocess
+import sys
+import pymssql
+from unittest.mock import Mock, patch
+from mssql_mcp_server import server, _common
+
+
+class TestConnectionPool:
+    """Test connection reuse and discard rules."""
+
+    def test_connection_is_reused(self, mock_connect, mock_conn):
+        """Test that a released connection is handed out again."""
+        with _common.acquire_conn() as conn:
+            assert conn is mock_conn
+        with _common.acquire_conn() as conn:
+            assert conn is mock_conn
+        assert mock_connect.call_count == 1
+        mock_conn.close.assert_not_called()
+
+    def test_interface_error_discards_connection(self, mock_conn):
+        """Test that a connection-level error closes instead of pooling."""
+        with pytest.raises(pymssql.InterfaceError):
+            with _common.acquire_conn():
+                raise pymssql.InterfaceError("connection lost")
+        mock_conn.close.assert_called_once()
+        assert _common._POOL.empty()
+
+    def test_dead_connection_is_discarded(self, mock_conn):
+        """Test that an OperationalError from a disconnected connection closes it."""
+        mock_conn._conn.connected = False
+        with pytest.raises(pymssql.OperationalError):
+            with _common.acquire_conn(autocommit=True):
+                raise pymssql.OperationalError(20047, b'DBPROCESS is dead or not enabled')
+        mock_conn.close.assert_called_once()
+        assert _common._POOL.empty()
+
+    def test_server_error_keeps_connection(self, mock_connect, mock_conn):
+        """Test that a statement error rolls back and returns the connection."""
+        mock_conn._conn.connected = True
+        with pytest.raises(pymssql.OperationalError):
+            with _common.acquire_conn():
+                raise pymssql.OperationalError(8115, b'Arithmetic overflow error')
+        mock_conn.rollback.assert_called_once()
+        mock_conn.close.assert_not_called()
+        with _common.acquire_conn() as conn:
+            assert conn is mock_conn
+        assert mock_connect.call_count == 1
+
+    def test_pool_size_is_at_least_one(self):
+        """Test that MSSQL_POOL_SIZE=0 cannot leave tools waiting for a slot forever."""
+        code = (
+            "from mssql_mcp_server import _common\n"
+            "assert _common.MSSQL_POOL_SIZE == 1\n"
+            "assert _common._POOL.maxsize == 1\n"
+        )
+        subprocess.run([sys.executable, '-c', code], check=True,
+                       env={**os.environ, 'MSSQL_POOL_SIZE': '0'})
+
+    def test_failed_rollback_discards_connection(self, mock_conn):
+        """Test that a connection failing its reset is not returned to the pool."""
+        mock_conn.rollback.side_effect = pymssql.OperationalError("gone")
+        with _common.acquire_conn():
+            pass
+        mock_conn.close.assert_called_once()
+        assert _common._POOL.empty()
+
+    def test_expired_connection_is_recycled(self, mock_conn):
+        """Test that connections older than MSSQL_POOL_RECYCLE are replaced."""
+        old_conn = Mock()
+        _common._POOL.put_nowait((old_conn, -_common.MSSQL_POOL_RECYCLE - 1.0, False))
+        with _common.acquire_conn() as conn:
+            assert conn is mock_conn
+        old_conn.close.assert_called_once()
+
+    def test_autocommit_mode_is_kept_while_pooled(self, mock_conn):
+        """Test that autocommit is only switched when the requested mode changes."""
+        with _common.acquire_conn(autocommit=True):
+            pass
+        with _common.acquire_conn(autocommit=True):
+            pass
+        mock_conn.autocommit.assert_called_once_with(True)
+        mock_conn.rollback.assert_not_called()
+        with _common.acquire_conn():
+            pass
+        mock_conn.autocommit.assert_called_with(False)
+        mock_conn.rollback.assert_called_once()
+
+    def test_lost_connection_empties_pool(self):
+        """Test that idle connections are discarded once one is found dead."""
+        idle_conn, dead_conn = Mock(), Mock()
+        dead_conn._conn.connected = False
+        _common._POOL.put_nowait((dead_conn, 0.0, True))
+        _common._POOL.put_nowait((idle_conn, 0.0, True))
+        with patch('time.monotonic', return_value=1.0):
+            with pytest.raises(pymssql.OperationalError):
+                with _common.acquire_conn(autocommit=True):
+                    raise pymssql.OperationalError(20047, b'DBPROCESS is dead or not enabled')
+        dead_conn.close.assert_called_once()
+        idle_conn.close.assert_called_once()
+        assert _common._POOL.empty()
+
+    @pytest.mark.asyncio
+    async def test_read_retries_on_new_connection(self, mock_connect):
+        """Test that a read on a dead pooled connection is retried once on a new one."""
+        dead_conn, new_conn = Mock(), Mock()
+        dead_conn._conn.connected = False
+        dead_conn.cursor.return_value.execute.side_effect = pymssql.OperationalError(
+            20047, b'DBPROCESS is dead or not enabled')
+        new_cursor = new_conn.cursor.return_value
+        new_cursor.description = [('Schema',), ('Table',)]
+        new_cursor.fetchmany.side_effect = [[('dbo', 'users')], []]
+        mock_connect.side_effect = [dead_conn, new_conn]
+        result = await server.list_sql_tables()
+        assert result == "Schema,Table\ndbo,users\n"
+        assert mock_connect.call_count == 2
+        dead_conn.close.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_read_replaces_dead_connection_on_mode_switch(self, mock_connect, mock_conn):
+        """Test that a dead idle connection failing its autocommit switch is replaced."""
+        dead_conn = Mock()
+        dead_conn._conn.connected = False
+        dead_conn.autocommit.side_effect = pymssql.OperationalError(
+            20047, b'DBPROCESS is dead or not enabled')
+        _common._POOL.put_nowait((dead_conn, 0.0, False))
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.description = [('Schema',), ('Table',)]
+        mock_cursor.fetchmany.side_effect = [[('dbo', 'users')], []]
+        with patch('time.monotonic', return_value=1.0):
+            result = await server.list_sql_tables()
+        assert result == "Schema,Table\ndbo,users\n"
+        assert mock_connect.call_count == 1
+        dead_conn.close.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_read_errors_are_not_retried(self, mock_connect, mock_conn):
+        """Test that a statement error on a live connection is not retried."""
+        mock_conn._conn.connected = True
+        mock_conn.cursor.return_value.execute.side_effect = pymssql.OperationalError(
+            8115, b'Arithmetic overflow error')
+        result = await server.list_sql_tables()
+        assert result.startswith('Error')
+        assert mock_conn.cursor.return_value.execute.call_count == 1
+        assert mock_connect.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_execute_sql_connection_is_not_pooled(self, mock_connect):
+        """Test that session state left by execute_sql never reaches a read tool."""
+        sql_conn, read_conn = Mock(), Mock()
+        sql_conn.cursor.return_value.description = None
+        read_cursor = read_conn.cursor.return_value
+        read_cursor.description = [('Schema',), ('Table',)]
+        read_cursor.fetchmany.side_effect = [[('dbo', 'users')], []]
+        mock_connect.side_effect = [sql_conn, read_conn]
+        await server.execute_sql('USE master')
+        result = await server.list_sql_tables()
+        assert result == "Schema,Table\ndbo,users\n"
+        assert mock_connect.call_count == 2
+        sql_conn.close.assert_called_once()
+        read_cursor.execute.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_tool_uses_pool(self, mock_connect, mock_conn):
+        """Test that tools borrow from the pool instead of reconnecting."""
+        mock_cursor = mock_conn.cursor.return_value
+        mock_cursor.description = [('Schema',), ('Table',)]
+        mock_cursor.fetchmany.side_effect = [[('dbo', 'users')], [], [('dbo', 'users')], []]
+        await server.list_sql_tables()
+        result = await server.list_sql_tables()
+        assert result == "Schema,Table\ndbo,users\n"
+        assert mock_connect.call_count == 1
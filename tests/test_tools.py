@@ -0,0 +1,42 @@
+"""Test tool registration for each FastMCP server."""
+import pytest
+from mssql_mcp_server import server, server_agencies, server_jumbos
+
+SHARED_TOOLS = {'execute_sql', 'count_user_logins', 'list_sql_tables', 'read_table_preview',
+                'preview_tables', 'ping'}
+
+
+async def tool_names(mcp):
+    return {tool.name for tool in await mcp.list_tools()}
+
+
+class TestToolRegistration:
+    """Test that every server exposes the shared tools plus its own."""
+
+    @pytest.mark.asyncio
+    async def test_prologue_server_tools(self):
+        """Test the Prologue90 server adds the trial balance report."""
+        assert server.mcp.name == 'mssql-mcp-prologue-p90'
+        assert await tool_names(server.mcp) == SHARED_TOOLS | {'report_trial_balance_by_seg_ref'}
+
+    @pytest.mark.asyncio
+    async def test_agency_and_jumbo_server_tools(self):
+        """Test the IPA servers expose only the shared tools."""
+        assert server_agencies.mcp.name == 'mssql-mcp-agencies'
+        assert server_jumbos.mcp.name == 'mssql-mcp-jumbos'
+        assert await tool_names(server_agencies.mcp) == SHARED_TOOLS
+        assert await tool_names(server_jumbos.mcp) == SHARED_TOOLS
+
+
+class TestPing:
+    """Test the ping health check."""
+
+    def test_ping_is_synchronous(self):
+        """Test that ping answers without an event loop."""
+        assert server.ping() == 'pong'
+
+    @pytest.mark.asyncio
+    async def test_ping_through_server(self):
+        """Test that ping is callable through the FastMCP server."""
+        result = await server.mcp.call_tool('ping', {})
+        assert 'pong' in str(result)